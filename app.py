@@ -2,30 +2,66 @@
 """Workout Tracker — macOS menu bar app for tracking push/pull/legs rotation."""
 
 import datetime
+import json
+import os
+import queue
+import threading
+import time
+import traceback
 import rumps
-import firebase_admin
-from firebase_admin import credentials, firestore
 # --- Firebase Setup ---
 
 CONFIG_DIR = "~/.config/workout-tracker"
 KEY_PATH = f"{CONFIG_DIR}/firebase-key.json"
+STATE_PATH = f"{CONFIG_DIR}/state.json"
 
 DEFAULT_CYCLE = ["push", "pull", "legs"]
 
+# Log fields the app actually reads; queries project to these to skip anything else
+LOG_FIELDS = ["date", "workout_type", "status"]
+
+# How long fetched log entries are reused before hitting Firestore again
+HISTORY_CACHE_TTL = 60
+# Max days of logs fetched per menu rebuild (covers streak, rest counter and schedule)
+HISTORY_DAYS = 60
+
+# Failed Firestore writes are retried with exponential backoff capped at this many seconds
+WRITE_RETRY_MAX_DELAY = 60
+# Firestore rejects write batches with more operations than this
+BATCH_MAX_WRITES = 500
+# How long Quit and Undo wait for queued writes before asking the user
+WRITE_DRAIN_TIMEOUT = 5
+# How long Summary and Undo wait for Firebase to connect before giving up
+DB_CONNECT_TIMEOUT = 5
+
+DAY_LABELS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MONTH_LABELS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
 
 def init_firebase():
-    """Initialize Firebase and return Firestore client."""
-    import os
+    """Initialize Firebase and return Firestore client, or None if the key is missing."""
     key_path = os.path.expanduser(KEY_PATH)
     if not os.path.exists(key_path):
-        rumps.alert(
-            title="Firebase Key Missing",
-            message=f"Place your Firebase service account key at:\n{key_path}\n\nSee setup instructions.",
-        )
         return None
-    cred = credentials.Certificate(key_path)
-    firebase_admin.initialize_app(cred)
-    return firestore.client()
+    # firebase_admin pulls in gRPC, so only import it once we know we need it
+    import firebase_admin
+    from firebase_admin import credentials
+    if not firebase_admin._apps:  # a retry after a failed connect reuses the app
+        firebase_admin.initialize_app(credentials.Certificate(key_path))
+    return _get_firestore().client()
+
+
+_firestore = None
+
+
+def _get_firestore():
+    """Return the firebase_admin.firestore module, importing it on first use."""
+    global _firestore
+    if _firestore is None:
+        from firebase_admin import firestore
+        _firestore = firestore
+    return _firestore
 
 
 def get_state(db):
@@ -44,51 +80,191 @@ def save_state(db, state):
     db.collection("tracker").document("state").set(state)
 
 
-def log_entry(db, workout_type, status, date=None):
-    """Write a workout log entry."""
-    if date is None:
-        date = datetime.date.today()
-    db.collection("logs").add({
-        "date": date.isoformat(),
-        "workout_type": workout_type,
-        "status": status,
-        "created_at": firestore.SERVER_TIMESTAMP,
-    })
+def update_state(db, fields):
+    """Write only the given state fields back to Firestore."""
+    db.collection("tracker").document("state").update(fields)
+
+
+def _load_local_state():
+    """Read the last known state from disk, or None if unavailable."""
+    try:
+        with open(os.path.expanduser(STATE_PATH)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_local_state(state):
+    """Write state to disk so the next launch can skip the Firestore read."""
+    path = os.path.expanduser(STATE_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+
+def commit_logs(db, entries, fields):
+    """Write log entries and the changed state fields in batched commits.
+
+    Entries go out in batches that fit Firestore's write limit, with the state
+    update in the last one. Entries are removed from the list as their batch
+    lands, so retrying with the same list doesn't write them twice.
+    """
+    logs = db.collection("logs")
+    server_timestamp = _get_firestore().SERVER_TIMESTAMP
+    while True:
+        chunk = entries[:BATCH_MAX_WRITES - 1]
+        batch = db.batch()
+        for entry in chunk:
+            batch.set(logs.document(), {**entry, "created_at": server_timestamp})
+        last = len(chunk) == len(entries)
+        if last:
+            batch.update(db.collection("tracker").document("state"), fields)
+        batch.commit()
+        del entries[:len(chunk)]
+        if last:
+            return
+
+
+def _is_permanent_error(exc):
+    """Return True for Firestore errors that retrying the same write won't fix."""
+    from google.api_core import exceptions
+    return isinstance(exc, (exceptions.InvalidArgument, exceptions.NotFound, exceptions.PermissionDenied))
 
 
 def get_history(db, limit=10):
     """Fetch recent log entries."""
     docs = (
         db.collection("logs")
-        .order_by("created_at", direction=firestore.Query.DESCENDING)
+        .select(LOG_FIELDS)
+        .order_by("created_at", direction=_get_firestore().Query.DESCENDING)
         .limit(limit)
         .stream()
     )
-    entries = []
-    for doc in docs:
-        d = doc.to_dict()
-        entries.append(d)
+    return [doc.to_dict() for doc in docs]
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_logs_since(db, since_date):
+    """Fetch log entries dated on or after since_date, newest first.
+
+    Entries on the same date are ordered by created_at here rather than in the
+    query, which would need a composite index.
+    """
+    docs = (
+        db.collection("logs")
+        .select(LOG_FIELDS + ["created_at"])
+        .where("date", ">=", since_date.isoformat())
+        .order_by("date", direction=_get_firestore().Query.DESCENDING)
+        .stream()
+    )
+    entries = [doc.to_dict() for doc in docs]
+    entries.sort(key=lambda e: (e["date"], e.get("created_at") or _EPOCH), reverse=True)
     return entries
 
 
+def _format_day_label(d):
+    """Format a date like "Monday Oct 12" without going through strftime."""
+    return f"{WEEKDAY_NAMES[d.weekday()]} {MONTH_LABELS[d.month - 1]} {d.day}"
+
+
 # --- Menu Bar App ---
 
 class WorkoutTracker(rumps.App):
     def __init__(self):
-        self.db = init_firebase()
-        if not self.db:
-            super().__init__("Workout", quit_button=None)
-            return
+        # Show the menu bar item right away; Firebase (gRPC) starts in the background
+        super().__init__("🏋️ …", quit_button=None)
+        self.db = None
+        self._remote_state = None
+        self._init_problem = None
+        self._init_problem_shown = None
+        self._db_ready = threading.Event()
+        threading.Thread(target=self._bg_init_firebase, daemon=True).start()
+        self._ready_timer = rumps.Timer(self._on_firebase_ready, 0.05)
+        self._ready_timer.start()
+
+        # Start from the local copy; on first run wait for Firestore instead
+        self.state = _load_local_state()
+        if self.state is not None:
+            self._setup()
+        else:
+            self.menu = [rumps.MenuItem("Quit", callback=lambda _: rumps.quit_application())]
 
-        self.state = get_state(self.db)
+    def _setup(self):
+        """Initialize in-memory state and build the menu from self.state."""
         self.cycle = self.state["cycle"]
+        self._cycle_len = len(self.cycle)
         self.position = self.state["position"]
-
-        current = self.current_workout()
-        super().__init__(f"🏋️ {current.title()}", quit_button=None)
+        self._history_cache = None
+        self._history_generation = 0
+        self._schedule_cache = None
+
+        # Menu refreshes are coalesced into one update on the next run loop pass
+        self._menu_dirty = False
+        self._menu_pending = False
+        self._menu_timer = rumps.Timer(self._flush_menu, 0.05)
+
+        # Firestore writes are queued and committed by a background worker
+        self._pending_logs = []
+        self._write_queue = queue.Queue()
+        self._writes_queued = 0
+        self._write_failing = False
+        self._write_failure_notified = False
+        self._write_rejections = []
+        threading.Thread(target=self._write_worker, daemon=True).start()
+        self._write_status_timer = rumps.Timer(self._check_write_status, 5)
+        self._write_status_timer.start()
 
         self._build_menu()
 
+    def _bg_init_firebase(self):
+        """Initialize Firebase and read the remote state off the main thread.
+
+        Retries with backoff until it works (e.g. offline at login, or the key
+        not placed yet), so queued writes go out once Firebase is reachable.
+        """
+        db = None
+        delay = 1
+        while True:
+            try:
+                if db is None:
+                    db = init_firebase()
+                if db is not None:
+                    self._remote_state = get_state(db)
+                    break
+                self._init_problem = "missing_key"
+            except Exception:
+                traceback.print_exc()
+                self._init_problem = "unavailable"
+            time.sleep(delay)
+            delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+        self.db = db
+        self._db_ready.set()
+
+    def _on_firebase_ready(self, _):
+        """Finish startup on the main thread once the background init is done."""
+        if not self._db_ready.is_set():
+            self._report_init_problem()
+            return
+        self._ready_timer.stop()
+
+        if self.state is None:
+            # First run — nothing cached locally yet
+            self.state = self._remote_state
+            _save_local_state(self.state)
+            self._setup()
+        else:
+            # Pick up changes made elsewhere (e.g. the web app) since the last launch.
+            # If anything was saved before Firebase was ready, the snapshot predates
+            # that write (even if it has landed since); leave reconciling to the
+            # periodic sync.
+            if not self._writes_queued:
+                self._apply_remote_state(self._remote_state)
+            # Anything built so far (e.g. a viewed schedule) used empty history
+            self._invalidate_history()
+            self.refresh_menu()  # log history is available now
+
         # Hide Dock icon once the run loop starts (delay so menu bar item exists first)
         self._hide_dock_timer = rumps.Timer(self._hide_dock_icon, 1)
         self._hide_dock_timer.start()
@@ -106,6 +282,27 @@ class WorkoutTracker(rumps.App):
         self._sync_timer = rumps.Timer(self._sync_from_firebase, 300)
         self._sync_timer.start()
 
+    def _report_init_problem(self):
+        """Tell the user once why Firebase isn't connected yet; the init keeps retrying."""
+        problem = self._init_problem
+        if problem is None or problem == self._init_problem_shown:
+            return
+        self._init_problem_shown = problem
+        if self.state is None:
+            self.title = "Workout"
+        if problem == "missing_key":
+            key_path = os.path.expanduser(KEY_PATH)
+            rumps.alert(
+                title="Firebase Key Missing",
+                message=f"Place your Firebase service account key at:\n{key_path}\n\nSee setup instructions.",
+            )
+        else:
+            rumps.notification(
+                title="Firebase Unavailable",
+                subtitle="Couldn't connect to Firebase",
+                message="Working from the local copy; changes will sync once it connects.",
+            )
+
     def _hide_dock_icon(self, _):
         """Remove the Dock icon after the menu bar is set up."""
         import AppKit
@@ -117,14 +314,28 @@ class WorkoutTracker(rumps.App):
         self._missed_days_timer.stop()
         self._check_missed_days()
 
+    def _wait_for_db(self):
+        """Wait briefly for Firebase to connect; return the client, or None after telling the user."""
+        if self._db_ready.wait(DB_CONNECT_TIMEOUT):
+            return self.db
+        rumps.alert(title="Still Connecting", message="Firebase isn't connected yet. Try again in a moment.", ok="OK")
+        return None
+
     def _sync_from_firebase(self, _):
         """Re-read state from Firebase and refresh if changed."""
-        new_state = get_state(self.db)
-        if new_state.get("last_log_date") != self.state.get("last_log_date") or \
-           new_state.get("position") != self.state.get("position"):
+        if self._write_queue.unfinished_tasks:
+            return  # a stale read would undo a queued write; try again next pass
+        self._apply_remote_state(get_state(self.db))
+
+    def _apply_remote_state(self, new_state):
+        """Adopt state read from Firebase if it differs from ours."""
+        if new_state != self.state:
             self.state = new_state
+            _save_local_state(self.state)
             self.cycle = self.state["cycle"]
+            self._cycle_len = len(self.cycle)
             self.position = self.state["position"]
+            self._invalidate_history()
             self.refresh_menu()
 
     def _check_day_change(self, _):
@@ -132,61 +343,218 @@ class WorkoutTracker(rumps.App):
         today = datetime.date.today()
         if today != self._current_date:
             self._current_date = today
+            self._invalidate_history()
             self.refresh_menu()
             self._check_missed_days()
 
     def current_workout(self):
-        return self.cycle[self.position % len(self.cycle)]
+        return self.cycle[self.position % self._cycle_len]
 
-    def _logged_today(self):
+    def _logged_today(self, today_iso=None):
         """Check if there's already a log entry for today."""
-        today = datetime.date.today().isoformat()
-        return self.state.get("last_log_date") == today
+        if today_iso is None:
+            today_iso = datetime.date.today().isoformat()
+        return self.state.get("last_log_date") == today_iso
+
+    def _history_since(self):
+        """Earliest date the menu helpers currently need log entries for."""
+        today = datetime.date.today()
+        earliest = today - datetime.timedelta(days=HISTORY_DAYS)
+        if self._logged_today(today.isoformat()):
+            return earliest  # a streak is only possible once today is logged
+        # Otherwise only this week (rest counter, schedule) and any missed days matter
+        since = today - datetime.timedelta(days=today.weekday())
+        try:
+            since = min(since, datetime.date.fromisoformat(self.state.get("last_log_date") or ""))
+        except ValueError:
+            pass
+        return max(since, earliest)
+
+    def _get_recent_logs(self):
+        """Return recent log entries, reusing one fetch across menu helpers."""
+        # Snapshot queued entries before fetching: the write worker may commit
+        # and drop them while the fetch is in flight
+        pending = list(self._pending_logs)
+        if self.db is None:
+            entries = []  # Firebase isn't connected yet
+        else:
+            now = time.monotonic()
+            since = self._history_since()
+            # Read the attribute once: the write worker may reset it concurrently
+            cache = self._history_cache
+            if cache is None or now - cache[0] > HISTORY_CACHE_TTL or cache[1] > since:
+                generation = self._history_generation
+                cache = (now, since, get_logs_since(self.db, since))
+                if generation == self._history_generation:
+                    self._history_cache = cache  # don't keep a fetch that raced a commit
+            entries = cache[2]
+        if pending:
+            # Queued writes may not be visible in Firestore yet; they are the
+            # newest entries for their date, so they go ahead of fetched ones
+            entries = sorted(pending[::-1] + entries, key=lambda e: e.get("date", ""), reverse=True)
+        return entries
+
+    def _invalidate_history(self):
+        """Drop cached log entries (and the schedule built from them) after a write."""
+        self._history_cache = None
+        self._schedule_cache = None
+
+    def _save_state(self, *keys):
+        """Persist state locally and queue the Firestore write.
+
+        With keys, only those fields are sent; otherwise the whole document is replaced.
+        """
+        _save_local_state(self.state)
+        self._writes_queued += 1
+        if keys:
+            self._write_queue.put({"op": "update_state", "fields": {k: self.state[k] for k in keys}})
+        else:
+            self._write_queue.put({"op": "save_state", "state": dict(self.state)})
+
+    def _queue_logs(self, entries):
+        """Queue log entries to be committed together with position and last_log_date."""
+        _save_local_state(self.state)
+        self._pending_logs.extend(entries)
+        self._schedule_cache = None
+        self._writes_queued += 1
+        fields = {"position": self.state["position"], "last_log_date": self.state["last_log_date"]}
+        self._write_queue.put({"op": "log", "logs": entries, "fields": fields})
+
+    def _write_worker(self):
+        """Commit queued writes in order, off the main thread.
+
+        A failed write is retried with backoff until it lands, so later writes
+        never overtake it and nothing is dropped while the app is running.
+        Writes Firestore rejects outright are dropped and reported instead.
+        """
+        self._db_ready.wait()
+        while True:
+            op = self._write_queue.get()
+            unwritten = list(op.get("logs", ()))
+            delay = 1
+            while True:
+                try:
+                    if op["op"] == "log":
+                        commit_logs(self.db, unwritten, op["fields"])
+                    elif op["op"] == "update_state":
+                        update_state(self.db, op["fields"])
+                    else:
+                        save_state(self.db, op["state"])
+                    break
+                except Exception as e:
+                    traceback.print_exc()
+                    if _is_permanent_error(e):
+                        self._write_rejections.append(str(e))
+                        break
+                    self._write_failing = True
+                    time.sleep(delay)
+                    delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+            self._write_failing = False
+            if op["op"] == "log":
+                # Drop the cache first so no refresh sees neither copy of the entries
+                self._history_cache = None
+                self._history_generation += 1
+                for entry in op["logs"]:
+                    self._pending_logs.remove(entry)
+            self._write_queue.task_done()
+
+    def _check_write_status(self, _):
+        """Notify the user about rejected writes, and when queued writes start failing and recover."""
+        while self._write_rejections:
+            rumps.notification(
+                title="Change Not Saved",
+                subtitle="Firebase rejected a change",
+                message=self._write_rejections.pop(0),
+            )
+        if self._write_failing and not self._write_failure_notified:
+            self._write_failure_notified = True
+            rumps.notification(
+                title="Sync Problem",
+                subtitle="Couldn't save to Firebase",
+                message="Retrying in the background. Keep the app open until it syncs.",
+            )
+        elif not self._write_failing and self._write_failure_notified and not self._write_queue.unfinished_tasks:
+            self._write_failure_notified = False
+            rumps.notification(title="Synced", subtitle="", message="All changes reached Firebase.")
+
+    def _drain_writes(self, timeout):
+        """Wait up to timeout seconds for queued writes; return True if all landed."""
+        deadline = time.monotonic() + timeout
+        while self._write_queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def quit_app(self, _):
+        """Quit once queued writes have reached Firebase, or the user accepts losing them."""
+        while not self._drain_writes(WRITE_DRAIN_TIMEOUT):
+            pending = self._write_queue.unfinished_tasks
+            response = rumps.alert(
+                title="Changes Not Synced",
+                message=f"{pending} change{'s' if pending != 1 else ''} haven't reached Firebase yet "
+                        "and will be lost if you quit now.",
+                ok="Keep Waiting",
+                cancel="Quit Anyway",
+            )
+            if response != 1:
+                break
+        rumps.quit_application()
+
+    @staticmethod
+    def _index_entries(entries):
+        """Map each date to its newest entry; entries come ordered by date, then created_at, newest first."""
+        index = {}
+        for entry in entries:
+            index.setdefault(entry.get("date", ""), entry)
+        return index
 
     def _get_streak(self):
         """Count consecutive days with a 'done' entry (including today)."""
-        entries = get_history(self.db, limit=60)
-        if not entries:
+        if not self._logged_today():
             return 0
-        done_dates = set()
-        for entry in entries:
-            if entry.get("status") == "done" and entry.get("date"):
-                done_dates.add(entry["date"])
+        return self._compute_streak(self._index_entries(self._get_recent_logs()))
+
+    def _compute_streak(self, index):
+        """Streak from an index of already-fetched entries."""
         streak = 0
         check = datetime.date.today()
-        while check.isoformat() in done_dates:
+        entry = index.get(check.isoformat())
+        while entry is not None and entry.get("status") == "done":
             streak += 1
             check -= datetime.timedelta(days=1)
+            entry = index.get(check.isoformat())
         return streak
 
     def _rest_days_this_week(self):
         """Count rest days taken in the current Mon-Sun week."""
         today = datetime.date.today()
         monday = today - datetime.timedelta(days=today.weekday())
-        entries = get_history(self.db, limit=30)
+        return self._compute_rest_days(self._index_entries(self._get_recent_logs()), monday, today)
+
+    def _compute_rest_days(self, index, monday, today):
+        """Rest days between monday and today from an index of already-fetched entries."""
         count = 0
-        for entry in entries:
-            try:
-                entry_date = datetime.date.fromisoformat(entry.get("date", ""))
-            except (ValueError, TypeError):
-                continue
-            if monday <= entry_date <= today and entry.get("status") == "rest":
+        for i in range((today - monday).days + 1):
+            entry = index.get((monday + datetime.timedelta(days=i)).isoformat())
+            if entry is not None and entry.get("status") == "rest":
                 count += 1
         return count
 
     def _get_week_schedule(self):
         """Build a Mon-Sun schedule with predicted rest days."""
         today = datetime.date.today()
+        key = (today.isoformat(), self.position, self.state.get("last_log_date"))
+        if self._schedule_cache is None or self._schedule_cache["key"] != key:
+            lines = self._compute_week_schedule(self._index_entries(self._get_recent_logs()), today)
+            self._schedule_cache = {"key": key, "lines": lines}
+        return list(self._schedule_cache["lines"])
+
+    def _compute_week_schedule(self, logged, today):
+        """Week schedule lines from an index of already-fetched entries."""
+        today_iso = today.isoformat()
         monday = today - datetime.timedelta(days=today.weekday())
-        done_today = self._logged_today()
-
-        # Get this week's log entries
-        entries = get_history(self.db, limit=30)
-        logged = {}
-        for entry in entries:
-            date_str = entry.get("date", "")
-            if date_str not in logged:
-                logged[date_str] = entry
+        done_today = self._logged_today(today_iso)
 
         # Collect indices of unlogged days (today if not logged + future)
         unlogged = []
@@ -198,7 +566,7 @@ class WorkoutTracker(rumps.App):
 
         # Predict which unlogged days are rest days
         rest_target = self.state.get("rest_days_per_week", 2)
-        rest_taken = self._rest_days_this_week()
+        rest_taken = self._compute_rest_days(logged, monday, today)
         rest_remaining = max(0, rest_target - rest_taken)
 
         rest_indices = set()
@@ -210,20 +578,20 @@ class WorkoutTracker(rumps.App):
                 idx = min(idx, len(unlogged) - 1)
                 rest_indices.add(unlogged[idx])
 
-        # Rewind cycle_pos to the start of the week by subtracting
-        # all "done" entries this week (position already reflects them)
-        done_this_week = sum(
-            1 for e in logged.values()
-            if e.get("status") == "done"
-            and monday.isoformat() <= e.get("date", "") <= today.isoformat()
-        )
-        cycle_pos = (self.position - done_this_week) % len(self.cycle)
+        # Position already reflects every "done" entry up to today, and all
+        # predicted days come after those, so the k-th predicted workout is
+        # simply position + k
+        cycle = self.cycle
+        cycle_len = self._cycle_len
+        start_pos = self.position % cycle_len
+        predicted = 0
+        wtype_titles = {w: w.title() for w in cycle}
 
         days = []
         for i in range(7):
             day = monday + datetime.timedelta(days=i)
             day_str = day.isoformat()
-            day_label = day.strftime("%a")
+            day_label = DAY_LABELS[i]
             entry = logged.get(day_str)
 
             if entry:
@@ -231,16 +599,14 @@ class WorkoutTracker(rumps.App):
                 wtype = entry.get("workout_type", "?").title()
                 mark = "+" if status == "done" else "-"
                 line = f"  {day_label}  {mark}  {wtype}"
-                if status == "done":
-                    cycle_pos = (cycle_pos + 1) % len(self.cycle)
             elif day < today:
                 line = f"  {day_label}  ·  —"
             elif i in rest_indices:
                 line = f"  {day_label}  ·  Rest"
             else:
-                wtype = self.cycle[cycle_pos % len(self.cycle)].title()
+                wtype = wtype_titles[cycle[(start_pos + predicted) % cycle_len]]
                 line = f"  {day_label}  ·  {wtype}"
-                cycle_pos = (cycle_pos + 1) % len(self.cycle)
+                predicted += 1
 
             if day == today:
                 line += "  ←"
@@ -248,7 +614,7 @@ class WorkoutTracker(rumps.App):
         return days
 
     def _check_missed_days(self):
-        """Check for days since last log and prompt per missed day."""
+        """Check for days since last log and prompt for the missed days."""
         last_log_date = self.state.get("last_log_date")
         if not last_log_date:
             return
@@ -264,100 +630,172 @@ class WorkoutTracker(rumps.App):
         if gap <= 1:
             return
 
-        # Build set of dates that already have entries
-        entries = get_history(self.db, limit=30)
-        logged_dates = set(e.get("date", "") for e in entries)
-
-        changed = False
+        # Collect missed dates that don't already have an entry
+        logged_dates = self._index_entries(self._get_recent_logs())
+        missed = []
         for i in range(1, gap):
             missed_date = last + datetime.timedelta(days=i)
-            if missed_date.isoformat() in logged_dates:
-                continue  # already has an entry, skip
-            workout = self.cycle[self.position % len(self.cycle)]
-            day_label = missed_date.strftime("%A %b %-d")
+            if missed_date.isoformat() not in logged_dates:
+                missed.append(missed_date)
+        if not missed:
+            return
 
-            response = rumps.alert(
-                title=f"Missed: {day_label}",
-                message=f"Scheduled workout: {workout.title()}\n\nDid you do it?",
-                ok="Done",
-                cancel="Skip",
-                other="Rest",
-            )
+        statuses = self._prompt_missed_statuses(missed)
+
+        # Replay the answers in order; only "done" advances the rotation
+        cycle = self.cycle
+        cycle_len = self._cycle_len
+        pos = self.position % cycle_len
+        logs = []
+        for missed_date, status in zip(missed, statuses):
+            workout = cycle[pos]
+            if status == "done":
+                pos = (pos + 1) % cycle_len
+            elif status == "rest":
+                workout = "rest"
+            logs.append({"date": missed_date.isoformat(), "workout_type": workout, "status": status})
+
+        self.position = pos
+        self.state["position"] = pos
+        self.state["last_log_date"] = (today - datetime.timedelta(days=1)).isoformat()
+        self._queue_logs(logs)
+        self.refresh_menu()
 
-            if response == 1:  # Done
-                log_entry(self.db, workout, "done", date=missed_date)
-                self.position = (self.position + 1) % len(self.cycle)
-                changed = True
-            elif response == -1:  # Rest (other button)
-                log_entry(self.db, "rest", "rest", date=missed_date)
-                changed = True
-            else:  # Skip
-                log_entry(self.db, workout, "skip", date=missed_date)
-                changed = True
-
-        if changed:
-            self.state["position"] = self.position
-            self.state["last_log_date"] = (today - datetime.timedelta(days=1)).isoformat()
-            save_state(self.db, self.state)
-            self.refresh_menu()
+    def _prompt_missed_statuses(self, missed):
+        """Ask for a done/rest/skip status for each missed date in one dialog."""
+        day_list = "\n".join(f"  {_format_day_label(d)}" for d in missed)
+        message = (
+            f"Enter one status per day, separated by commas: done, rest or skip.\n\n"
+            f"Next in rotation: {self.current_workout().title()}\n\n{day_list}"
+        )
+        text = ", ".join("done" for _ in missed)
+        while True:
+            response = rumps.Window(
+                title=f"Missed {len(missed)} day{'s' if len(missed) != 1 else ''}",
+                message=message,
+                default_text=text,
+                ok="Save",
+                cancel="Skip All",
+                dimensions=(300, 24),
+            ).run()
+            if not response.clicked:
+                return ["skip"] * len(missed)
+            text = response.text
+            statuses = [s.strip().lower() for s in text.split(",") if s.strip()]
+            if len(statuses) == len(missed) and all(s in ("done", "rest", "skip") for s in statuses):
+                return statuses
+            rumps.alert(
+                title="Couldn't read statuses",
+                message=f"Enter exactly {len(missed)} of: done, rest, skip.",
+                ok="OK",
+            )
 
     def _build_menu(self):
         """Build (or rebuild) the entire menu."""
         self.menu.clear()
-        current = self.current_workout()
-        done_today = self._logged_today()
 
-        # Streak
-        streak = self._get_streak()
-        if streak > 0:
-            self.menu.add(rumps.MenuItem(f"🔥 {streak} day streak", callback=None))
-            self.menu.add(None)
+        # Items whose text or visibility depends on state are kept as handles
+        # so routine updates can mutate them instead of rebuilding the menu.
+        self._streak_item = rumps.MenuItem("🔥 Streak", callback=None)
+        self._streak_sep = rumps.SeparatorMenuItem()
+        self._today_item = rumps.MenuItem("Today", callback=None)
+        self._today_sep = rumps.SeparatorMenuItem()
+        self._done_item = rumps.MenuItem("✅ Done", callback=self.mark_done)
+        self._rest_item = rumps.MenuItem("😴 Rest Instead", callback=self.mark_rest)
+        self._rest_counter_item = rumps.MenuItem("😴 Rest", callback=None)
+
+        self._cycle_submenu = rumps.MenuItem("— Rotation —")
+        self._cycle_items = []
+        for i, w in enumerate(self.cycle):
+            # rumps keys submenu items by their initial title, so make it unique in
+            # case a workout repeats; _update_menu sets the displayed title
+            item = rumps.MenuItem(f"{i}. {w.title()}", callback=None)
+            self._cycle_submenu.add(item)
+            self._cycle_items.append(item)
+        self._menu_cycle = list(self.cycle)
+
+        self.menu = [
+            self._streak_item,
+            self._streak_sep,
+            self._today_item,
+            self._today_sep,
+            self._done_item,
+            self._rest_item,
+            None,
+            self._rest_counter_item,
+            None,
+            self._cycle_submenu,
+            None,
+            rumps.MenuItem("📅 View Schedule", callback=self.show_schedule),
+            rumps.MenuItem("📊 Summary", callback=self.show_summary),
+            rumps.MenuItem("Edit Cycle...", callback=self.edit_cycle),
+            rumps.MenuItem("Rest Days/Week...", callback=self.edit_rest_target),
+            rumps.MenuItem("Quit", callback=self.quit_app),
+        ]
+
+        self._update_menu()
+
+    def _update_menu(self):
+        """Update the existing menu items in place to reflect current state."""
+        current_title = self.current_workout().title()
+        today = datetime.date.today()
+        today_iso = today.isoformat()
+        done_today = self._logged_today(today_iso)
+        index = self._index_entries(self._get_recent_logs())
+
+        # Streak (today must be logged for it to be non-zero)
+        streak = self._compute_streak(index) if done_today else 0
+        self._streak_item.title = f"🔥 {streak} day streak"
+        self._streak_item.hidden = streak == 0
+        self._streak_sep._menuitem.setHidden_(streak == 0)
 
         if done_today:
-            entries = get_history(self.db, limit=1)
-            logged_type = entries[0].get("workout_type", current).title() if entries else current.title()
-            logged_status = entries[0].get("status", "") if entries else ""
+            today_entry = index.get(today_iso)
+            logged_type = today_entry.get("workout_type", current_title).title() if today_entry else current_title
+            logged_status = today_entry.get("status", "") if today_entry else ""
             if logged_type.lower() == "rest" or logged_status == "rest":
-                self.title = f"😴 Rest"
+                new_title = "😴 Rest"
             else:
-                self.title = f"✅ {logged_type}"
-            self.menu.add(rumps.MenuItem("Today's workout logged!", callback=None))
-            self.menu.add(rumps.MenuItem("↩ Undo", callback=self.undo_today))
-            self.menu.add(None)
+                new_title = f"✅ {logged_type}"
+            self._today_item.title = "Today's workout logged!"
+            self._today_sep._menuitem.setHidden_(True)
+            self._done_item.title = "↩ Undo"
+            self._done_item.set_callback(self.undo_today)
+            self._rest_item.set_callback(None)
+            self._rest_item.hide()
         else:
-            self.title = f"🏋️ {current.title()}"
-            self.menu.add(rumps.MenuItem(f"Today: {current.title()} Day", callback=None))
-            self.menu.add(None)
-            self.menu.add(rumps.MenuItem("✅ Done", callback=self.mark_done))
-            self.menu.add(rumps.MenuItem("😴 Rest Instead", callback=self.mark_rest))
-            self.menu.add(None)
+            new_title = f"🏋️ {current_title}"
+            self._today_item.title = f"Today: {current_title} Day"
+            self._today_sep._menuitem.setHidden_(False)
+            self._done_item.title = "✅ Done"
+            self._done_item.set_callback(self.mark_done)
+            self._rest_item.set_callback(self.mark_rest)
+            self._rest_item.show()
+
+        # Setting the title always pushes it to the status item, so skip no-ops
+        if self.title != new_title:
+            self.title = new_title
 
         # Rest day counter
         rest_target = self.state.get("rest_days_per_week", 2)
-        rest_taken = self._rest_days_this_week()
-        self.menu.add(rumps.MenuItem(f"😴 Rest: {rest_taken}/{rest_target} this week", callback=None))
-        self.menu.add(None)
+        monday = today - datetime.timedelta(days=today.weekday())
+        rest_taken = self._compute_rest_days(index, monday, today)
+        self._rest_counter_item.title = f"😴 Rest: {rest_taken}/{rest_target} this week"
 
         # Cycle rotation
-        display_pos = (self.position - 1) % len(self.cycle) if done_today else self.position % len(self.cycle)
-        cycle_menu = rumps.MenuItem("— Rotation —")
-        for i, w in enumerate(self.cycle):
+        cycle_len = self._cycle_len
+        pos = self.position % cycle_len
+        display_pos = (pos - 1) % cycle_len if done_today else pos
+        for i, (w, item) in enumerate(zip(self.cycle, self._cycle_items)):
             arrow = "→ " if i == display_pos else "    "
-            cycle_menu.add(rumps.MenuItem(f"{arrow}🏋️ {w.title()}", callback=None))
-        self.menu.add(cycle_menu)
-        self.menu.add(None)
-
-        self.menu.add(rumps.MenuItem("📅 View Schedule", callback=self.show_schedule))
-        self.menu.add(rumps.MenuItem("📊 Summary", callback=self.show_summary))
-        self.menu.add(rumps.MenuItem("Edit Cycle...", callback=self.edit_cycle))
-        self.menu.add(rumps.MenuItem("Rest Days/Week...", callback=self.edit_rest_target))
-        self.menu.add(rumps.MenuItem("Quit", callback=rumps.quit_application))
+            item.title = f"{arrow}🏋️ {w.title()}"
 
     def show_schedule(self, _):
         """Show the weekly schedule in a dialog."""
         lines = self._get_week_schedule()
         today = datetime.date.today()
-        week_label = f"Week of {(today - datetime.timedelta(days=today.weekday())).strftime('%b %-d')}"
+        monday = today - datetime.timedelta(days=today.weekday())
+        week_label = f"Week of {MONTH_LABELS[monday.month - 1]} {monday.day}"
         rest_target = self.state.get("rest_days_per_week", 2)
         rest_taken = self._rest_days_this_week()
         lines.append("")
@@ -370,10 +808,13 @@ class WorkoutTracker(rumps.App):
 
     def show_summary(self, _):
         """Show all-time stats in a dialog."""
+        if self._wait_for_db() is None:
+            return
         # Fetch all log entries
         docs = (
             self.db.collection("logs")
-            .order_by("created_at", direction=firestore.Query.ASCENDING)
+            .select(LOG_FIELDS)
+            .order_by("created_at", direction=_get_firestore().Query.ASCENDING)
             .stream()
         )
         entries = [doc.to_dict() for doc in docs]
@@ -383,14 +824,18 @@ class WorkoutTracker(rumps.App):
             return
 
         # Start date
+        _fromiso = datetime.date.fromisoformat
         first_date = None
         for e in entries:
+            date_str = e.get("date")
+            if not isinstance(date_str, str) or len(date_str) != 10:
+                continue
             try:
-                d = datetime.date.fromisoformat(e.get("date", ""))
-                if first_date is None or d < first_date:
-                    first_date = d
-            except (ValueError, TypeError):
-                pass
+                d = _fromiso(date_str)
+            except ValueError:
+                continue
+            if first_date is None or d < first_date:
+                first_date = d
 
         today = datetime.date.today()
         total_days = (today - first_date).days + 1 if first_date else 0
@@ -409,9 +854,12 @@ class WorkoutTracker(rumps.App):
         # Longest streak
         dates_done = set()
         for e in done:
+            date_str = e.get("date")
+            if not isinstance(date_str, str) or len(date_str) != 10:
+                continue
             try:
-                dates_done.add(datetime.date.fromisoformat(e.get("date", "")))
-            except (ValueError, TypeError):
+                dates_done.add(_fromiso(date_str))
+            except ValueError:
                 pass
         longest_streak = 0
         if dates_done:
@@ -453,22 +901,36 @@ class WorkoutTracker(rumps.App):
         )
 
     def refresh_menu(self):
-        """Rebuild the full menu to reflect updated state."""
-        self._build_menu()
+        """Schedule a menu update; repeated calls before it runs are coalesced."""
+        self._menu_dirty = True
+        if not self._menu_pending:
+            self._menu_pending = True
+            self._menu_timer.start()
+
+    def _flush_menu(self, _):
+        """Apply a pending refresh; rebuild only if the cycle changed."""
+        self._menu_timer.stop()
+        self._menu_pending = False
+        if not self._menu_dirty:
+            return
+        self._menu_dirty = False
+        if self.cycle != self._menu_cycle:
+            self._build_menu()
+        else:
+            self._update_menu()
 
     def mark_done(self, _):
         """Log workout as done and advance the rotation."""
         if self._logged_today():
             return
         workout = self.current_workout()
-        log_entry(self.db, workout, "done")
-
+        today = datetime.date.today().isoformat()
 
         # Advance position
-        self.position = (self.position + 1) % len(self.cycle)
+        self.position = (self.position + 1) % self._cycle_len
         self.state["position"] = self.position
-        self.state["last_log_date"] = datetime.date.today().isoformat()
-        save_state(self.db, self.state)
+        self.state["last_log_date"] = today
+        self._queue_logs([{"date": today, "workout_type": workout, "status": "done"}])
 
         rumps.notification(
             title="Workout Logged 💪",
@@ -482,10 +944,10 @@ class WorkoutTracker(rumps.App):
         if self._logged_today():
             return
         workout = self.current_workout()
-        log_entry(self.db, "rest", "rest")
+        today = datetime.date.today().isoformat()
 
-        self.state["last_log_date"] = datetime.date.today().isoformat()
-        save_state(self.db, self.state)
+        self.state["last_log_date"] = today
+        self._queue_logs([{"date": today, "workout_type": "rest", "status": "rest"}])
 
         rumps.notification(
             title="Rest Day 😴",
@@ -496,6 +958,11 @@ class WorkoutTracker(rumps.App):
 
     def undo_today(self, _):
         """Remove today's log entry and revert state."""
+        if self._wait_for_db() is None:
+            return
+        if not self._drain_writes(WRITE_DRAIN_TIMEOUT):  # today's entry may still be queued
+            rumps.alert(title="Still Syncing", message="Today's entry hasn't reached Firebase yet. Try Undo again shortly.", ok="OK")
+            return
         today = datetime.date.today().isoformat()
         docs = self.db.collection("logs").where("date", "==", today).stream()
         entry = None
@@ -509,13 +976,15 @@ class WorkoutTracker(rumps.App):
 
         # Revert position if it was a "done" entry
         if entry.get("status") == "done":
-            self.position = (self.position - 1) % len(self.cycle)
+            self.position = (self.position - 1) % self._cycle_len
             self.state["position"] = self.position
 
         # Set last_log_date to the most recent remaining entry
+        # (of any age, so this can't use the HISTORY_DAYS window)
+        self._invalidate_history()
         remaining = get_history(self.db, limit=1)
         self.state["last_log_date"] = remaining[0].get("date") if remaining else None
-        save_state(self.db, self.state)
+        self._save_state("position", "last_log_date")
         self.refresh_menu()
 
     def edit_cycle(self, _):
@@ -534,10 +1003,12 @@ class WorkoutTracker(rumps.App):
             new_cycle = [w.strip().lower() for w in response.text.split(",") if w.strip()]
             if new_cycle:
                 self.cycle = new_cycle
+                self._cycle_len = len(new_cycle)
                 self.position = 0
                 self.state["cycle"] = self.cycle
                 self.state["position"] = 0
-                save_state(self.db, self.state)
+                self._save_state()
+                self._schedule_cache = None
                 self.refresh_menu()
                 rumps.notification(
                     title="Cycle Updated",
@@ -562,7 +1033,8 @@ class WorkoutTracker(rumps.App):
                 new_target = int(response.text.strip())
                 if 0 <= new_target <= 7:
                     self.state["rest_days_per_week"] = new_target
-                    save_state(self.db, self.state)
+                    self._save_state("rest_days_per_week")
+                    self._schedule_cache = None
                     self.refresh_menu()
             except ValueError:
                 pass